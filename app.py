@@ -1,10 +1,11 @@
-from typing import Dict, List
+from typing import Dict, Iterator, List
 import streamlit as st
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
 import re
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from enum import Enum
 from io import BytesIO
+import functools
 import genanki
 import hashlib
 
@@ -45,86 +46,83 @@ class CardType(Enum):
     DIRECT = "DIRECT"
     CLASSIFICATION = "CLASSIFICATION"
 
-@dataclass
+@dataclass(slots=True)
 class Card:
     type: CardType                # card type
     question: str                 # card front
     answer: str                   # card back
-    tags: List[str] = field(default_factory=list)
+    tags: tuple[str, ...] = ()   # shared tuple, identical for every card in a run
     
 
 # ----------------------------- LOGIC -----------------------------
 
-def gen_id_from_text(name: str) -> str:
-    return hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
-
-def is_direct_line(line: str) -> bool:
-    # Detect lines with ":" or "||" as separators
-    return bool(re.search(r'\S\s*(?:\|\||:)\s*\S', line))
+def _classify(line: str) -> int:
+    # 0 = direct/definition line (":" or "||" with content on both sides),
+    # 1 = anything else (bracket headers, block items, noise)
+    i = line.find("||")
+    if i > 0 and line[:i].strip() and line[i + 2:].strip():
+        return 0
+    j = line.find(":")
+    if j > 0 and line[:j].strip() and line[j + 1:].strip():
+        return 0
+    return 1
 
 
 def is_single_paragraph_fill(lines: List[str]) -> bool:
     if not lines or len(lines) < 2:
         return False
     first_line = lines[0].strip()
-    return all(line.strip() in first_line for line in lines[1:] if line.strip())
-
-def process_text( 
-                text: str, 
-                gen_fill: bool, 
+    first_len = len(first_line)
+    for line in lines[1:]:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        # an item longer than the paragraph can't be contained in it
+        if len(stripped) > first_len or stripped not in first_line:
+            return False
+    return True
+
+def process_text(
+                text: str,
+                gen_fill: bool,
                 gen_class: bool,
-                raw_tags: List[str]):
-    lines = text.split("\n")
-    tags = [t.replace(" ","_") for t in raw_tags]
+                raw_tags: List[str]) -> Iterator[Card]:
+    lines = text.splitlines()
+    tags = tuple(t.replace(" ","_") for t in raw_tags)
     direct_lines = []
-    cards = []
     other_lines = []
+    buckets = (direct_lines, other_lines)
     for l in lines:
-        if is_direct_line(l):
-            direct_lines.append(l)
-        else:
-            other_lines.append(l)
-            
-    direct_cards = create_direct_cards(direct_lines, tags)
-    cards.extend(direct_cards)
-            
-    other_cards = create_fill_and_classification_cards(other_lines, tags, gen_fill, gen_class)
-    cards.extend(other_cards)
-    
-    return cards
+        buckets[_classify(l)].append(l)
+
+    yield from create_direct_cards(direct_lines, tags)
+    yield from create_fill_and_classification_cards(other_lines, tags, gen_fill, gen_class)
+
+
+def create_direct_cards(lines: List[str], tags: tuple[str, ...]) -> Iterator[Card]:
+    _Card = Card            # locals spare a LOAD_GLOBAL per card
+    _DIRECT = CardType.DIRECT
+    for line in lines:
+        # inlined separator split: "||" wins over ":", same as split_direct_line did
+        front, found, back = line.partition("||")
+        is_definition = False
+        if not found:
+            front, found, back = line.partition(":")
+            if not found:
+                continue
+            is_definition = True
 
+        front = front.strip()
+        back = back.strip()
+        yield _Card(type=_DIRECT,
+                question=f"Define {front}" if is_definition else front,
+                answer=line, tags=tags)
+        # also make a definition -> name card
+        if is_definition:
+            yield _Card(type=_DIRECT,
+                question=back, answer=front, tags=tags)
 
-def create_direct_cards(lines: List[str], tags: List[str]) -> List[Card]:
-        cards = []
-        if not lines:
-            return cards
-        
-        for line in lines:
-            parts = split_direct_line(line)
-            if not parts or len(parts) < 2:
-                continue
-            
-            is_definition = not "||" in line
-            front, back = parts
-            cards.append(Card(type=CardType.DIRECT, 
-                    question=f"Define {front}" if is_definition else front,
-                    answer=line,  tags=tags)
-        )   # also make a definition -> name card
-            if is_definition:
-                cards.append(Card( type=CardType.DIRECT, 
-                    question=back, answer=front, tags=tags))
-                
-        return cards 
-
-
-def split_direct_line(line: str) -> tuple[str, str] | None:
-    for sep in ("||", ":"):
-        if sep in line:
-            front, back = map(str.strip, line.split(sep, 1))
-            return front, back
-    return None
 
-    
 def split_blocks(lines: List[str]) -> Dict[str, List[str]]:
     blocks = {}
     cur_block = []
@@ -135,13 +133,14 @@ def split_blocks(lines: List[str]) -> Dict[str, List[str]]:
         if not l:
             continue
 
-        match =  re.search(r"\[(.+?)\]", l)
-        if match:
+        lb = l.find('[')
+        rb = l.find(']', lb + 1) if lb >= 0 else -1
+        if lb >= 0 and rb > lb + 1:
             if cur_struct and cur_block:
                 blocks[cur_struct] = cur_block
 
-            cur_struct = match.group(1).strip()
-            cur_block = [re.sub(r'[\[\]]', '', l)]
+            cur_struct = l[lb + 1:rb].strip()
+            cur_block = [l.replace('[', '').replace(']', '')]
         else:
             cur_block.append(l)
 
@@ -150,48 +149,77 @@ def split_blocks(lines: List[str]) -> Dict[str, List[str]]:
 
     return blocks
 
-def create_fill_and_classification_cards(lines: List[str], tags: List[str], 
+# below this many blocks the thread-pool overhead outweighs the overlap
+_PARALLEL_BLOCK_THRESHOLD = 16
+
+def _create_block_cards(entry: tuple[str, List[str]], tags: tuple[str, ...],
                     generate_fill: bool,
                     generate_class: bool) -> List[Card]:
+    struct_name, block = entry
     cards = []
-    if not lines or not any([generate_fill , generate_class]):
+    if not block:
         return cards
 
-    blocks = split_blocks(lines)
+    if generate_fill:
+        cards.extend(create_fill_cards(block, tags))
 
-    for struct_name, block in blocks.items():
-        if not block:
-            continue
+    if generate_class:
+        cards.extend(Card(type=CardType.CLASSIFICATION,
+                    question=item, answer=struct_name, tags=tags)
+                    for item in block[1:] if item)
+    return cards
 
-        if generate_fill:
-            fill_cards =  create_fill_cards(block, tags)
-            cards.extend(fill_cards)
+def create_fill_and_classification_cards(lines: List[str], tags: tuple[str, ...],
+                    generate_fill: bool,
+                    generate_class: bool) -> Iterator[Card]:
+    if not lines or not any([generate_fill , generate_class]):
+        return
 
-        if generate_class:
-            classification_cards = [Card(type=CardType.CLASSIFICATION,
-                                    question=item,answer=struct_name,tags=tags)
-                                    for item in block[1:] if item]
-            cards.extend(classification_cards)
+    blocks = split_blocks(lines)
+    worker = functools.partial(_create_block_cards, tags=tags,
+                    generate_fill=generate_fill,
+                    generate_class=generate_class)
+
+    if len(blocks) > _PARALLEL_BLOCK_THRESHOLD:
+        # blocks are independent; overlap their regex passes across threads
+        with ThreadPoolExecutor() as executor:
+            for block_cards in executor.map(worker, blocks.items()):
+                yield from block_cards
+    else:
+        for entry in blocks.items():
+            yield from worker(entry)
 
-    return cards
+@functools.lru_cache(maxsize=128)
+def _cloze_pattern(terms: tuple[str, ...]) -> re.Pattern:
+    # Streamlit reruns resubmit the same blocks; reuse the compiled alternation
+    return re.compile("|".join(map(re.escape, terms)))
 
-def create_fill_cards(lines_block: List[str], tags) -> List[Card]:
-    cards = []
+def create_fill_cards(lines_block: List[str], tags) -> Iterator[Card]:
     #generate differently if the items are within the first line
     is_single_paragraph = is_single_paragraph_fill(lines_block)
-    
-    cloze_text = lines_block[0] if is_single_paragraph else "\n".join(lines_block) 
-    for i, term in enumerate(lines_block[1:], 1):
-        term_clean = " ".join(term.split())
-        cloze_text = cloze_text.replace(term_clean, f"{{{{c{i}::{term_clean}}}}}", 1)
-    cards.append(Card(
+
+    cloze_text = lines_block[0] if is_single_paragraph else "\n".join(lines_block)
+    terms = [" ".join(term.split()) for term in lines_block[1:]]
+    if terms:
+        # one alternation pass over the text instead of one rescan per term
+        index = {term: i for i, term in enumerate(terms, 1)}
+        pattern = _cloze_pattern(tuple(terms))
+        seen = set()
+
+        def blank(m: re.Match) -> str:
+            term = m.group(0)
+            if term in seen:
+                return term
+            seen.add(term)
+            return f"{{{{c{index[term]}::{term}}}}}"
+
+        cloze_text = pattern.sub(blank, cloze_text)
+    yield Card(
         type=CardType.FILL,
         question=cloze_text,
         answer=cloze_text,
         tags=tags
-    ))
-        
-    return cards
+    )
 
         
 # ----------------------------- PAGE CONFIG -----------------------------
@@ -231,37 +259,48 @@ with st.form("anki_form"):
 
 # ----------------------------- OUTPUT -----------------------------
 
-def create_apkg(deck_name: str,cards : List[Card] ) -> BytesIO:
-    """Generate an .apkg deck and return it as BytesIO"""
+# genanki models, built once at import instead of per deck export
+_SIMPLE_MODEL = genanki.Model(
+        1761428899,
+        'Basic Model',
+        fields=[{'name': 'Front'}, {'name': 'Back'}],
+        templates=[{
+            'name': 'Card 1',
+            'qfmt': '{{Front}}',
+            'afmt': '{{FrontSide}}<hr id="answer">{{Back}}',
+        }]
+    )
+
+_CLOZE_MODEL = genanki.CLOZE_MODEL
+
+def create_apkg(deck_name: str, cards: Iterator[Card]) -> tuple[BytesIO, int]:
+    """Generate an .apkg deck from a card stream.
+
+    Returns the deck as BytesIO plus the number of cards consumed."""
     deck_id = int(hashlib.sha1(deck_name.encode("utf-8")).hexdigest()[:8], 16)
     my_deck = genanki.Deck(deck_id, deck_name)
 
-    # genanki models
-    simple_model = genanki.Model(
-            1761428899,
-            'Basic Model',
-            fields=[{'name': 'Front'}, {'name': 'Back'}],
-            templates=[{
-                'name': 'Card 1',
-                'qfmt': '{{Front}}',
-                'afmt': '{{FrontSide}}<hr id="answer">{{Back}}',
-            }]
-        )
-
-    cloze_model = genanki.CLOZE_MODEL
+    # deck_name is constant across the loop: absorb it into the hasher once
+    # and copy() per card, so only the question is hashed each time
+    base_hasher = hashlib.blake2b((deck_name + "||").encode("utf-8"), digest_size=8)
+    fork_hasher = base_hasher.copy
 
+    num_cards = 0
     for c in cards:
-        guid = gen_id_from_text(f"{c.question}||{deck_name}")
+        num_cards += 1
+        card_hasher = fork_hasher()
+        card_hasher.update(c.question.encode("utf-8"))
+        guid = card_hasher.hexdigest()
         if c.type == CardType.FILL:
             note = genanki.Note(
-                model=cloze_model,
+                model=_CLOZE_MODEL,
                 fields=[c.question],
                 tags=c.tags, 
                 guid=guid
                 )
         else:
             note = genanki.Note(
-                model=simple_model,
+                model=_SIMPLE_MODEL,
                 fields=[c.question, c.answer], 
                 tags=c.tags, 
                 guid=guid
@@ -272,7 +311,7 @@ def create_apkg(deck_name: str,cards : List[Card] ) -> BytesIO:
     pkg = genanki.Package(my_deck)
     pkg.write_to_file(output)
     output.seek(0)
-    return output
+    return output, num_cards
 
 
 if submitted:
@@ -280,12 +319,11 @@ if submitted:
         st.warning("Please enter the formatted text first.")
     else:
         cards = process_text(text,fill, rev, tags.split(","))
-        num_cards = len(cards)
+        apkg_file, num_cards = create_apkg(deck_name, cards)
 
         if num_cards == 0:
             st.warning("No cards were created. Please check your input.")
         else:
-            apkg_file = create_apkg(deck_name, cards)
             st.success(f"✅ Deck '{deck_name}' created with {num_cards} cards!")
 
             st.download_button(